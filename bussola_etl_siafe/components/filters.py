@@ -1,12 +1,18 @@
-import time
-from typing import List
+from typing import Any, Callable, Iterable, List, Mapping, Optional, TypeVar
 
+import log  # type: ignore
 from selenium.common.exceptions import (
-    NoSuchElementException,
     StaleElementReferenceException,
+    TimeoutException,
 )
+from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from bussola_etl_siafe.components.select import select_by_visible_text
+
+T = TypeVar('T')
 
 
 class Filter:
@@ -29,6 +35,50 @@ class Filter:
     _value_input_sel = "[id*='in_value_rtfFilter::content']"
     """CSS selector for an <input> field with the filter value."""
 
+    _value_any_sel = ", ".join([_value_select_sel, _value_input_sel])
+    """CSS selector for the filter value field, be it a <select> or <input>."""
+
+    _read_fields_js = """
+        const [container, rowsSel, propertySel, negateSel, operationSel,
+            valueSel] = arguments;
+        const rows = rowsSel ? container.querySelectorAll(rowsSel) : [container];
+        return Array.from(rows, (row) => {
+            const property = row.querySelector(propertySel);
+            const negate = row.querySelector(negateSel);
+            const operation = row.querySelector(operationSel);
+            const value = row.querySelector(valueSel);
+            return {
+                filtered_property: property && property.title,
+                negate: Boolean(negate && negate.checked),
+                operation: operation && operation.title,
+                value: value && (value.title || value.value),
+            };
+        });
+    """
+    """JavaScript that reads all fields of one or more filter rows in a single
+    call."""
+
+    @classmethod
+    def _read_fields(
+        cls, container: WebElement, rows_sel: Optional[str] = None
+    ) -> List[Mapping[str, Any]]:
+        """Read the fields of filter rows in the browser.
+
+        Parameters:
+            container: A `WebElement` instance for a filter row or, if
+                `rows_sel` is given, for an element that contains the rows.
+            rows_sel: CSS selector for the filter rows inside `container`.
+        """
+        return container.parent.execute_script(
+            cls._read_fields_js,
+            container,
+            rows_sel,
+            cls._property_select_sel,
+            cls._negate_checkbox_sel,
+            cls._operation_select_sel,
+            cls._value_any_sel,
+        )
+
     @classmethod
     def from_element(cls, filter_elem: WebElement):
         """Initialize a Filter instance from a `WebElement`.
@@ -36,41 +86,29 @@ class Filter:
         Parameters:
             filter_elem: A `WebElement` instance
         """
+        return cls.from_fields(cls._read_fields(filter_elem)[0])
 
-        # get the table property that the filter is applied to
-        property_elem = filter_elem.find_element_by_css_selector(
-            cls._property_select_sel
-        )
-        filtered_property = property_elem.get_attribute('title')
-        if filtered_property is None or filtered_property == "Selecione":
-            # the row is reserved for adding new a filter; skip it
-            return None
-
-        # get whether the operation is to be negated
-        negate_elem = filter_elem.find_element_by_css_selector(
-            cls._property_select_sel
-        )
-        if negate_elem.get_attribute('checked'):
-            negate = True
-        else:
-            negate = False
+    @classmethod
+    def from_fields(cls, fields: Mapping[str, Any]):
+        """Initialize a Filter instance from the fields read in a filter row.
 
-        # get the filter operation
-        operation_elem = filter_elem.find_element_by_css_selector(
-            cls._operation_select_sel
-        )
-        operation = operation_elem.get_attribute('title')
+        Parameters:
+            fields: A mapping with the `filtered_property`, `operation`,
+                `value` and `negate` fields of the filter.
+        """
 
-        # get filter value
-        value_elem = filter_elem.find_element_by_css_selector(
-            ", ".join([cls._value_select_sel, cls._value_input_sel])
-        )
-        value = value_elem.get_attribute('title')
-        if not value:
-            value = value_elem.get_attribute('value')
+        filtered_property = fields['filtered_property']
+        if not filtered_property or filtered_property == "Selecione":
+            # the row is reserved for adding new a filter; skip it
+            return None
 
         # instantiate filter
-        return Filter(filtered_property, operation, value, negate)
+        return Filter(
+            filtered_property,
+            fields['operation'],
+            fields['value'] or "",
+            fields['negate'],
+        )
 
     def __init__(
         self,
@@ -86,27 +124,15 @@ class Filter:
 
     def __eq__(self, other):
         """Determines whether an object is identical to the Filter instance."""
-        print("Checking equality")
         try:
-            print(
-                f"Properties: {self.filtered_property} X {other.filtered_property}"
-            )
-            print(f"Operation: {self.operation} X {other.operation}")
-            print(f"Values: {self.value} X {other.value}")
-            print(f"Negate: {self.negate} X {other.negate}")
-            is_equal: bool = all(
-                [
-                    self.filtered_property == other.filtered_property,
-                    self.operation == other.operation,
-                    self.value == other.value,
-                    self.negate == other.negate,
-                ]
+            return (
+                self.filtered_property == other.filtered_property
+                and self.operation == other.operation
+                and self.value == other.value
+                and self.negate == other.negate
             )
         except AttributeError:
-            print("Something is missing")
-            is_equal = False
-
-        return is_equal
+            return False
 
 
 class FilterMenu:
@@ -126,34 +152,67 @@ class FilterMenu:
     _filters_header_sel: str = "[id*='sdtFilter::head']"
     """CSS selector for the filter menu headers"""
 
-    def __init__(self, page: WebElement):
+    def __init__(self, page: WebElement, timeout: int = 10):
         self._page: WebElement = page
+        self.timeout = timeout
+        self._header_cached: Optional[WebElement] = None
+        self._body_cached: Optional[WebElement] = None
+        self._filters_cached: Optional[List[Filter]] = None
 
     @property
     def _header(self) -> WebElement:
-        return self._page.driver.find_element_by_css_selector(
-            FilterMenu._filters_header_sel
-        )
+        if self._header_cached is None:
+            self._header_cached = WebDriverWait(
+                self._page.driver, self.timeout
+            ).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, FilterMenu._filters_header_sel)
+                )
+            )
+        return self._header_cached
 
     @property
     def _body(self) -> WebElement:
-        return self._page.driver.find_element_by_css_selector(
-            FilterMenu._filters_body_sel
+        if self._body_cached is None:
+            self._body_cached = WebDriverWait(
+                self._page.driver, self.timeout
+            ).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, FilterMenu._filters_body_sel)
+                )
+            )
+        return self._body_cached
+
+    def _find(self, parent: WebElement, selector: str) -> WebElement:
+        """Wait for an element that matches a CSS selector inside `parent`."""
+        return WebDriverWait(self._page.driver, self.timeout).until(
+            lambda driver: parent.find_element(By.CSS_SELECTOR, selector)
         )
 
-    @property
-    def visible(self) -> bool:
-        """Whether filter collection body is visible."""
+    def _forget_elements(self) -> None:
+        """Drop cached menu elements, so they are looked up again."""
+        self._header_cached = None
+        self._body_cached = None
 
-        visible: bool
+    def _retry_stale(self, action: Callable[[], T]) -> T:
+        """Run an action that uses the cached menu elements.
 
-        try:
-            assert self._header.find_elements_by_class_name("x16b")
-            visible = True
-        except (AssertionError, StaleElementReferenceException):
-            visible = False
+        If the menu has been re-rendered and the cached elements have become
+        stale, they are looked up again and the action is retried.
+        """
+        for _ in range(2):
+            try:
+                return action()
+            except StaleElementReferenceException:
+                self._forget_elements()
+        return action()
 
-        return visible
+    @property
+    def visible(self) -> bool:
+        """Whether filter collection body is visible."""
+        return self._retry_stale(
+            lambda: bool(self._header.find_elements(By.CLASS_NAME, "x16b"))
+        )
 
     @visible.setter
     def visible(self, value: bool) -> None:
@@ -164,31 +223,52 @@ class FilterMenu:
         """Switch visibility of the filter collection body in page."""
 
         initial_state = self.visible
-        counter = 0
 
-        while self.visible == initial_state:
-            if counter % 5 == 0:
-                toggle_button = self._header.find_element_by_css_selector(
-                    self._toggle_button_sel
-                )
-                toggle_button.click()
-            else:
-                time.sleep(1)
-            counter += 1
+        for attempt in range(1, 4):
+            self._retry_stale(
+                lambda: self._header.find_element(
+                    By.CSS_SELECTOR, self._toggle_button_sel
+                ).click()
+            )
+            # the menu is re-rendered when toggled
+            self._forget_elements()
+            try:
+                WebDriverWait(
+                    self._page.driver, self.timeout, poll_frequency=0.1
+                ).until(lambda driver: self.visible != initial_state)
+                break
+            except TimeoutException:
+                if attempt < 3:
+                    log.debug(
+                        'Filter menu did not toggle. '
+                        + f'Try again... (attempt {attempt}/3)'
+                    )
+                    continue  # did not toggle. Click again.
+                else:
+                    log.error('Could not toggle the filter menu.')
+                    raise
 
     @property
     def filters(self) -> List[Filter]:
         """List all filters currently in the filter collection."""
 
+        # filters only change through this menu; reuse the last reading
+        if self._filters_cached is not None:
+            return list(self._filters_cached)
+
         self.visible = True
 
+        # read all rows in the browser
         filters: List[Filter] = list()
-        for filter_elem in self._body.find_elements_by_class_name("xzy"):
-            filter_ = Filter.from_element(filter_elem)
+        for fields in self._retry_stale(
+            lambda: Filter._read_fields(self._body, ".xzy")
+        ):
+            filter_ = Filter.from_fields(fields)
             if filter_:
                 filters.append(filter_)
 
-        return filters
+        self._filters_cached = filters
+        return list(filters)
 
     @filters.setter
     def filters(self, new_filter: Filter) -> None:
@@ -199,56 +279,54 @@ class FilterMenu:
         if not isinstance(new_filter, Filter):
             raise TypeError
 
+        self._filters_cached = None
         self.visible = True
 
-        slot = self._body.find_elements_by_class_name("xzy")[-1]
+        # the last row in the menu is reserved for adding a new filter
+        def find_slot() -> WebElement:
+            return self._body.find_elements(By.CLASS_NAME, "xzy")[-1]
+
+        slot = self._retry_stale(find_slot)
+
+        def find_field(selector: str) -> WebElement:
+            nonlocal slot
+            try:
+                return self._find(slot, selector)
+            except StaleElementReferenceException:
+                # the row has been re-rendered; look it up again
+                self._forget_elements()
+                slot = self._retry_stale(find_slot)
+                return self._find(slot, selector)
 
         # set filter property
-        property_elem = slot.find_element_by_css_selector(
-            Filter._property_select_sel
-        )
-        Select(property_elem).select_by_visible_text(
-            new_filter.filtered_property
-        )
+        property_elem = find_field(Filter._property_select_sel)
+        select_by_visible_text(property_elem, new_filter.filtered_property)
 
         # set whether filter operation should be negated
         if new_filter.negate:
-            slot = self._body.find_elements_by_class_name("xzy")[-1]
-            negate_elem = slot.find_element_by_css_selector(
-                Filter._negate_checkbox_sel
-            )
+            negate_elem = find_field(Filter._negate_checkbox_sel)
             negate_elem.click()
 
         # set the filter operation
-        while True:
-            slot = self._body.find_elements_by_class_name("xzy")[-1]
-            operation_elem = slot.find_element_by_css_selector(
+        operation_elem = find_field(Filter._operation_select_sel)
+        select_by_visible_text(operation_elem, new_filter.operation)
+        WebDriverWait(
+            self._page.driver,
+            self.timeout,
+            poll_frequency=0.05,
+            ignored_exceptions=[StaleElementReferenceException],
+        ).until(
+            lambda driver: find_field(
                 Filter._operation_select_sel
-            )
-            if operation_elem.get_attribute("title") == new_filter.operation:
-                break
-            else:
-                Select(operation_elem).select_by_visible_text(
-                    new_filter.operation
-                )
-                time.sleep(2)
+            ).get_attribute("title")
+            == new_filter.operation
+        )
 
-        # set the filter value
-        try:
-            slot = self._body.find_elements_by_class_name("xzy")[-1]
-            value_elems = slot.find_elements_by_css_selector(
-                Filter._value_select_sel
-            )
-            Select(value_elems[0]).select_by_visible_text(new_filter.value)
-        except (
-            StaleElementReferenceException,
-            NoSuchElementException,
-            IndexError,
-        ):
-            slot = self._body.find_elements_by_class_name("xzy")[-1]
-            value_elem = slot.find_element_by_css_selector(
-                Filter._value_input_sel
-            )
+        # set the filter value, either in a <select> or in an <input> field
+        value_elem = find_field(Filter._value_any_sel)
+        if value_elem.tag_name == "select":
+            select_by_visible_text(value_elem, new_filter.value)
+        else:
             value_elem.send_keys(new_filter.value)
 
     # TODO: single filter delete
@@ -258,12 +336,30 @@ class FilterMenu:
 
         self.visible = True
 
-        reset_button = self._header.find_element_by_css_selector(
-            self._reset_button_sel
+        self._retry_stale(
+            lambda: self._header.find_element(
+                By.CSS_SELECTOR, self._reset_button_sel
+            ).click()
         )
-        reset_button.click()
+        self._forget_elements()
+        self._filters_cached = None
 
     def apply(self):
         """Apply the latest changes in filters and collapse the menu."""
-        self._body.click()
+        self._retry_stale(lambda: self._body.click())
+        self._forget_elements()
+        self._filters_cached = None
         self.visible = False
+
+    def apply_batch(self, new_filters: Iterable[Filter]) -> None:
+        """Add several filters and apply them all at once.
+
+        The menu is expanded and collapsed a single time for the whole batch,
+        instead of once for each filter.
+
+        Parameters:
+            new_filters: The filters to be added.
+        """
+        for new_filter in new_filters:
+            self.filters = new_filter
+        self.apply()
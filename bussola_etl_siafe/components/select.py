@@ -0,0 +1,38 @@
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import Select
+
+_select_by_text_js = """
+    const [select, text] = arguments;
+    const option = Array.from(select.options).find((o) => o.text === text);
+    if (!option) {
+        return false;
+    }
+    select.value = option.value;
+    select.dispatchEvent(new Event('change', {bubbles: true}));
+    return true;
+"""
+"""JavaScript that selects the option with a given text in a <select> element.
+"""
+
+
+def select_by_visible_text(select_elem: WebElement, text: str) -> None:
+    """Select the option that displays a given text in a <select> element.
+
+    Searches and selects the option within the browser, in a single
+    round-trip, instead of reading each option through Selenium's `Select`.
+    A `change` event is dispatched, so that the page reacts as if the user
+    had picked the option. If no option is found this way, falls back to
+    `Select.select_by_visible_text`.
+
+    Parameters:
+        select_elem: A `WebElement` instance for the <select> element.
+        text: The visible text of the option to be selected.
+
+    Raises:
+        NoSuchElementException: If there is no option with the given text.
+    """
+    selected = select_elem.parent.execute_script(
+        _select_by_text_js, select_elem, text
+    )
+    if not selected:
+        Select(select_elem).select_by_visible_text(text)
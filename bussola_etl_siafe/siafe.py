@@ -24,29 +24,132 @@
     This module maps SIAFE-Rio web interface to Python classes and methods.
 """
 
+import json
+import multiprocessing
 import os
 import re
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
 from datetime import date, timedelta
-from functools import cached_property
-from typing import Mapping, Optional, Sequence, Union
+from functools import cached_property, lru_cache
+from itertools import repeat
+from multiprocessing.util import Finalize
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import log  # type: ignore
 from dotenv import load_dotenv
 from selenium import webdriver
-from selenium.common.exceptions import (  # NoSuchElementException,
-    NoSuchAttributeException,
+from selenium.common.exceptions import (
+    NoSuchElementException,
     StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
 )
 from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.support.ui import Select
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 
 from bussola_etl_siafe.components.filters import FilterMenu
+from bussola_etl_siafe.components.select import select_by_visible_text
 
 load_dotenv("../.env")
 
-sys.path.append(os.environ["CHROME_PATH"])
+if "CHROME_PATH" in os.environ:
+    sys.path.append(os.environ["CHROME_PATH"])
+
+_UG_SPLIT_RE = re.compile(r' +- +')
+"""Separator between the code and the name of a budget Management Unit (UG),
+as in '999999 - NAME OF THE UNIT'."""
+
+
+def _split_ug_text(ug_text: str) -> List[str]:
+    """Split the text of a Management Unit (UG) into its code and name.
+
+    UG texts are usually separated by a single ' - ', which is split without
+    the regex engine. `_UG_SPLIT_RE` is used as fallback for irregular
+    spacing around the hyphen.
+    """
+    code, separator, name = ug_text.partition(' - ')
+    if separator and not code.endswith(' ') and not name.startswith(' '):
+        return [code, name]
+    return _UG_SPLIT_RE.split(ug_text, 1)
+
+
+@lru_cache(maxsize=64)
+def _ug_pattern(ug_code: str, ug_name: str) -> Pattern[str]:
+    """Compile a regular expression for searching a Management Unit (UG).
+
+    The expression is meant to be matched against the text of each UG option,
+    which starts with the code and the name of the unit.
+    """
+    return re.compile(ug_code + r' +- +' + ug_name)
+
+
+_DRIVER_POOL: Dict[Tuple, List[webdriver.Chrome]] = {}
+"""Idle WebDriver sessions signed in SIAFE-Rio, waiting to be reused by
+`SiafeClient.acquire`."""
+
+_DRIVER_POOL_SIZE = 4
+"""Maximum number of idle WebDriver sessions kept for each pool key."""
+
+
+def _driver_pool_key(
+    user: str,
+    fiscal_year: int,
+    driver_path: Union[str, bytes, os.PathLike],
+    driver_options: Optional[ChromeOptions],
+) -> Tuple:
+    """Build the key that identifies interchangeable pooled sessions."""
+    if driver_options is None:
+        options_key = None
+    else:
+        options_key = json.dumps(
+            driver_options.to_capabilities(), sort_keys=True, default=str
+        )
+    return (user, fiscal_year, os.fsdecode(driver_path), options_key)
+
+
+class _AttachedRemote(webdriver.Remote):
+    """Remote WebDriver that attaches to an existing session."""
+
+    def __init__(self, command_executor: str, session_id: str):
+        self._attached_session_id = session_id
+        super().__init__(command_executor=command_executor)
+
+    def start_session(self, capabilities, browser_profile=None):
+        # do not request a new session to the server; reuse the given one
+        self.session_id = self._attached_session_id
+        self.w3c = True
+        self.command_executor.w3c = True
+
+
+class _ReleasedDriver:
+    """Placeholder for the WebDriver of a client that has been released."""
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        raise RuntimeError(
+            'The WebDriver session has been released by this client.'
+        )
 
 
 class SiafeClient:
@@ -66,6 +169,9 @@ class SiafeClient:
             https://sites.google.com/a/chromium.org/chromedriver/downloads).
 
     Keyword Arguments:
+        driver_options: Options for the Chrome WebDriver session. Defaults to
+            a headless browser that skips loading images and stops waiting
+            for pages as soon as their DOM is ready.
         fiscal_year: Fiscal year for budget planning and execution. Defaults to
             the current year.
         timeout: Maximum time to wait for an element while browsing the page
@@ -73,10 +179,14 @@ class SiafeClient:
 
     Attributes:
         build: SIAFE-Rio current build. Not implemented yet.
+        executor_url: URL of the WebDriver server that holds the session.
         fiscal_year: Fiscal year for budget planning and execution information
             shown in the system.
         remaining_time: Remaining time for the current session. Not implemented
             yet.
+        session_id: ID of the WebDriver session signed in SIAFE-Rio. Along
+            with `executor_url`, it can be used to share the session with
+            another client (see `SiafeClient.from_session`).
         timeout: Maximum time to wait for an element while browsing the page
             (in seconds).
         user: User name or number currently signed in the SIAFE system.
@@ -89,9 +199,71 @@ class SiafeClient:
             timeout.
     """
 
+    __slots__ = (
+        'user',
+        '_password',
+        'fiscal_year',
+        'timeout',
+        'driver',
+        '_wait',
+        'executor_url',
+        'session_id',
+        '_ug',
+        '_available_ugs',
+        '_ug_options_texts',
+        '_ug_select_elem',
+        '_ug_by_code',
+        '_pool_key',
+        '_navigation',
+        '_greeting',
+    )
+
+    user: Optional[str]
+    _password: str
+    fiscal_year: Optional[int]
+    driver: webdriver.Remote
     _greeting_statement_id = 'pt1:pt_aot1'
+    _year_statement_id = 'pt1:pt_aot2'
     _ug_select_id = 'pt1:selUg::content'
+    _available_ugs: Optional[List[Mapping[str, str]]]
+    _ug_options_texts: Optional[List[str]]
+    _ug_select_elem: Optional[WebElement]
+    _ug_by_code: Optional[Mapping[str, str]]
+    _ug_snapshot_js = """
+        const select = document.getElementById(arguments[0]);
+        if (!select) {
+            return null;
+        }
+        return {
+            title: select.title,
+            options: Array.from(select.options, (o) => o.text),
+        };
+    """
+    _snapshot_js = """
+        const [greetingId, yearId, ugSelectId] = arguments;
+        const text = (id) => {
+            const element = document.getElementById(id);
+            const displayed = element && element.getClientRects().length > 0;
+            return displayed ? element.innerText : null;
+        };
+        const ugSelect = document.getElementById(ugSelectId);
+        return {
+            greeting: text(greetingId),
+            year: text(yearId),
+            ug: ugSelect ? ugSelect.title : null,
+        };
+    """
+    _window_size: Tuple[int, int] = (3840, 2160)
+    _pool_key: Optional[Tuple]
+    _greeting: Optional[str]
+    _navigation: Dict[str, Tuple[str, ...]]
     _login_url: str = 'https://www5.fazenda.rj.gov.br/SiafeRio/faces/login.jsp'
+    _login_locators: Mapping[str, Tuple[str, str]] = {
+        'user_input': (By.ID, 'loginBox:itxUsuario::content'),
+        'password_input': (By.ID, 'loginBox:itxSenhaAtual::content'),
+        'fiscal_year_select': (By.ID, 'loginBox:cbxExercicio::content'),
+        'submit_button': (By.ID, 'loginBox:btnConfirmar'),
+    }
     # _thematic_tab_ids: Mapping[str, str] = {
     #     'planning': 'pt1:pt_np4:0:pt_cni6::disclosureAnchor',
     #     'execution': 'pt1:pt_np4:1:pt_cni6::disclosureAnchor',
@@ -107,25 +279,40 @@ class SiafeClient:
         password: str,
         driver_path: Union[str, bytes, os.PathLike],
         driver_options: Optional[ChromeOptions] = None,
-        fiscal_year: int = date.today().year,
+        fiscal_year: Optional[int] = None,
         timeout: int = 10,
     ):
-        self.user = user
-        self._password = password
-        self.fiscal_year = fiscal_year
-        self.timeout = timeout
+        if fiscal_year is None:
+            fiscal_year = date.today().year
+        pool_key = _driver_pool_key(
+            user, fiscal_year, driver_path, driver_options
+        )
 
         log.debug('Starting Chrome WebDriver session...')
-        self.driver = webdriver.Chrome(driver_path, options=driver_options)
-        self.driver.implicitly_wait(self.timeout)
-        self.driver.set_window_size(3840, 2160)
+        custom_options = driver_options is not None
+        if not custom_options:
+            driver_options = self._default_driver_options()
+        driver = webdriver.Chrome(driver_path, options=driver_options)
+        self._prepare_driver(driver, timeout, resize=custom_options)
+        self._setup_session(
+            driver,
+            timeout,
+            user=user,
+            password=password,
+            fiscal_year=fiscal_year,
+            pool_key=pool_key,
+        )
 
         log.info('Connecting to SIAFE-Rio Basic Module...')
         try:
             self._login()
-        except (StaleElementReferenceException, TimeoutError):
+        except (
+            StaleElementReferenceException,
+            TimeoutError,
+            TimeoutException,
+        ):
             # Could not find greetings, something has gone wrong
-            self.close()
+            self.quit()
             log.error(
                 'An unexpected error occurred. Could not connect to SIAFE-Rio.'
             )
@@ -133,59 +320,303 @@ class SiafeClient:
         else:
             log.info('Successfully signed in SIAFE-Rio Basic module.')
 
+    @classmethod
+    def _prepare_driver(
+        cls, driver: webdriver.Remote, timeout: int = 10, resize: bool = True
+    ) -> None:
+        """Sets up a new WebDriver session the way the client expects it.
+
+        Args:
+            driver: WebDriver session to set up.
+            timeout: Seconds to wait for pages and scripts to load.
+            resize: Whether to resize the window (windows of browsers started
+                with the client's default options already have the size).
+        """
+        # elements that need to be waited for are waited explicitly
+        driver.implicitly_wait(0)
+        # fail fast, instead of hanging, if the server does not respond
+        driver.set_page_load_timeout(timeout)
+        driver.set_script_timeout(timeout)
+        if resize:
+            driver.set_window_size(*cls._window_size)
+
+    @classmethod
+    def from_session(
+        cls, executor_url: str, session_id: str, timeout: int = 10
+    ) -> 'SiafeClient':
+        """Reuse a WebDriver session that is already signed in SIAFE-Rio.
+
+        Attaches to the session of another client, instead of starting a new
+        browser and signing in again. The user and fiscal year of the session
+        are not known by the new client, and are set to `None`.
+
+        Arguments:
+            executor_url: URL of the WebDriver server that holds the session
+                (see the `executor_url` attribute of the original client).
+            session_id: ID of the signed in WebDriver session (see the
+                `session_id` attribute of the original client).
+
+        Keyword Arguments:
+            timeout: Maximum time to wait for an element while browsing the
+                page (in seconds). Defaults to 10 seconds.
+        """
+        log.debug('Attaching to an existing WebDriver session...')
+        client = cls.__new__(cls)
+        client._setup_session(
+            _AttachedRemote(executor_url, session_id), timeout
+        )
+        return client
+
+    @classmethod
+    def acquire(
+        cls,
+        user: str,
+        password: str,
+        driver_path: Union[str, bytes, os.PathLike],
+        driver_options: Optional[ChromeOptions] = None,
+        fiscal_year: Optional[int] = None,
+        timeout: int = 10,
+    ) -> 'SiafeClient':
+        """Get a client signed in SIAFE-Rio, reusing an idle session if any.
+
+        Sessions given back with `release` are kept in a pool, keyed by user,
+        fiscal year, driver path and driver options. If a matching session is
+        still signed in, it is reused, skipping the browser start and the
+        login. Otherwise, a new client is created.
+
+        Takes the same arguments as `SiafeClient`.
+        """
+        if fiscal_year is None:
+            fiscal_year = date.today().year
+        key = _driver_pool_key(user, fiscal_year, driver_path, driver_options)
+        pooled_drivers = _DRIVER_POOL.get(key, [])
+        while pooled_drivers:
+            driver = pooled_drivers.pop()
+            try:
+                signed_in = not driver.current_url.startswith(cls._login_url)
+            except WebDriverException:
+                signed_in = False
+            if not signed_in:
+                log.debug('Discarding pooled WebDriver session...')
+                with suppress(WebDriverException):
+                    driver.quit()
+                continue
+            log.debug('Reusing pooled WebDriver session...')
+            client = cls.__new__(cls)
+            client._setup_session(
+                driver,
+                timeout,
+                user=user,
+                password=password,
+                fiscal_year=fiscal_year,
+                pool_key=key,
+            )
+            return client
+        return cls(
+            user, password, driver_path, driver_options, fiscal_year, timeout
+        )
+
+    def release(self) -> None:
+        """Give the WebDriver session back to the pool used by `acquire`.
+
+        The session is quit instead if the pool for it is already full. If
+        the client is attached to another client's session (such as panels
+        and clients created with `from_session`), it is only detached, and
+        the session is left open for the other client.
+
+        The client cannot browse after being released.
+        """
+        if self._pool_key is None:
+            log.debug('Detaching from a shared WebDriver session...')
+        else:
+            pooled_drivers = _DRIVER_POOL.setdefault(self._pool_key, [])
+            if len(pooled_drivers) >= _DRIVER_POOL_SIZE:
+                self.quit()
+            else:
+                log.debug('Returning WebDriver session to the pool...')
+                pooled_drivers.append(self.driver)
+        # fail loudly if the client is used again
+        self.driver = _ReleasedDriver()
+        self._wait = WebDriverWait(self.driver, self.timeout)
+        self._forget_ugs()
+
+    def _setup_session(
+        self,
+        driver: webdriver.Remote,
+        timeout: int,
+        user: Optional[str] = None,
+        password: str = '',
+        fiscal_year: Optional[int] = None,
+        pool_key: Optional[Tuple] = None,
+        navigation: Optional[Dict[str, Tuple[str, ...]]] = None,
+        wait: Optional[WebDriverWait] = None,
+    ) -> None:
+        """Set up the client to browse with a WebDriver session.
+
+        Clients attached to the session of another client have no pool key,
+        and should share that client's `navigation` state and `wait`.
+        """
+        self.user = user
+        self._password = password
+        self.fiscal_year = fiscal_year
+        self.timeout = timeout
+        self.driver = driver
+        self._wait = wait or WebDriverWait(driver, timeout)
+        self.executor_url = driver.command_executor._url
+        self.session_id = driver.session_id
+        self._pool_key = pool_key
+        self._navigation = {} if navigation is None else navigation
+        self._greeting = None
+        self._forget_ugs()
+
+    def _find(self, by: str, locator: str) -> WebElement:
+        """Wait for an element to be present in the page, and return it."""
+        return self._wait.until(EC.presence_of_element_located((by, locator)))
+
+    def _js_get(self, element_id: str, prop: str = 'textContent') -> Any:
+        """Read a property of an element by its ID.
+
+        Returns `None` if the element is not in the page.
+        """
+        return self.driver.execute_script(
+            'return (document.getElementById(arguments[0]) || {})[arguments[1]];',
+            element_id,
+            prop,
+        )
+
+    def _forget_ugs(self) -> None:
+        """Discard the cached Management Units (UGs) and their <select>."""
+        self._available_ugs = None
+        self._ug_options_texts = None
+        self._ug_select_elem = None
+        self._ug_by_code = None
+
+    def _ug_select(self, refresh: bool = False) -> WebElement:
+        """Get the <select> element for budget Management Units (UGs).
+
+        The element is looked up once and reused in later calls, unless
+        `refresh` is set (e.g., when the page has been re-rendered and the
+        element has become stale).
+        """
+        if refresh or self._ug_select_elem is None:
+            self._ug_select_elem = self._find(By.ID, self._ug_select_id)
+        return self._ug_select_elem
+
+    def _select_ug_option(self, ug_option_text: str) -> None:
+        """Select an option in the <select> element for UGs, by its text."""
+        try:
+            select_by_visible_text(self._ug_select(), ug_option_text)
+        except StaleElementReferenceException:
+            # the page has re-rendered the <select>; look it up again
+            select_by_visible_text(self._ug_select(True), ug_option_text)
+        # the page may re-render the <select> after a change; look it up
+        # again next time (its options remain the same)
+        self._ug_select_elem = None
+
+    def _ug_snapshot(self) -> Mapping[str, Any]:
+        """Read the UG <select> title and options texts.
+
+        Returns a mapping with the `title` of the <select> element (that holds
+        the current UG) and the `options` texts (all available UGs).
+        """
+        return self._wait.until(
+            lambda driver: driver.execute_script(
+                self._ug_snapshot_js, self._ug_select_id
+            )
+        )
+
+    @staticmethod
+    def _default_driver_options() -> ChromeOptions:
+        """Build Chrome options that speed up browsing SIAFE-Rio."""
+        driver_options = ChromeOptions()
+        driver_options.add_argument('--headless=new')
+        # large viewports render more table rows per scroll
+        driver_options.add_argument(
+            '--window-size={},{}'.format(*SiafeClient._window_size)
+        )
+        # return from navigation when the DOM is ready, not the subresources
+        driver_options.set_capability('pageLoadStrategy', 'eager')
+        # do not load images nor ask for notifications
+        driver_options.add_experimental_option(
+            'prefs',
+            {
+                'profile.managed_default_content_settings.images': 2,
+                'profile.default_content_setting_values.notifications': 2,
+            },
+        )
+        driver_options.add_argument('--blink-settings=imagesEnabled=false')
+        driver_options.add_argument('--disable-extensions')
+        driver_options.add_argument('--disable-gpu')
+        # skip background work that is useless for an automated session
+        driver_options.add_argument('--disable-dev-shm-usage')
+        driver_options.add_argument('--disable-background-networking')
+        driver_options.add_argument('--disable-sync')
+        driver_options.add_argument('--no-first-run')
+        driver_options.add_argument('--disable-default-apps')
+        driver_options.add_argument('--disable-renderer-backgrounding')
+        return driver_options
+
     def _login(self):
         """Interact with login form for SIAFE-Rio .
 
         Interacts with SIAFE-Rio login form, inputing user credentials,
         selecting the fiscal year and submiting the form.
         """
-        login_form_ids: Mapping[str, str] = {
-            'user_input': 'loginBox:itxUsuario::content',
-            'password_input': 'loginBox:itxSenhaAtual::content',
-            'fiscal_year_select': 'loginBox:cbxExercicio::content',
-            'submit_button': 'loginBox:btnConfirmar',
-        }
-        self.driver.get(self._login_url)
+        try:
+            self.driver.get(self._login_url)
+        except TimeoutException:
+            log.error(
+                f'SIAFE-Rio login page did not load in {self.timeout} seconds.'
+            )
+            raise
+        # wait for the login form to be rendered
+        user_input = self._find(*self._login_locators['user_input'])
+        fiscal_year_select = self._find(
+            *self._login_locators['fiscal_year_select']
+        )
         # insert user
         log.debug('Entering user ID')
-        user_input = self.driver.find_element_by_id(
-            login_form_ids['user_input']
-        )
         user_input.send_keys(self.user)
         # select fiscal year
         log.debug(f'Selecting fiscal year ({self.fiscal_year})')
-        fiscal_year_select = self.driver.find_element_by_id(
-            login_form_ids['fiscal_year_select']
-        )
-        Select(fiscal_year_select).select_by_visible_text(
-            str(self.fiscal_year)
-        )
+        select_by_visible_text(fiscal_year_select, str(self.fiscal_year))
         # try to insert password
+        password_input = self._find(*self._login_locators['password_input'])
         for attempt in range(1, 4):
+            log.debug(f'Entering user password ({attempt}/3)')
             try:
-                log.debug(f'Entering user password ({attempt}/3)')
-                password_input = self.driver.find_element_by_id(
-                    login_form_ids['password_input']
-                )
-                password_value = password_input.get_attribute('value')
-                assert len(password_value) == len(self._password)
-                time.sleep(2)
-            except (AssertionError, NoSuchAttributeException):
+                password_input.clear()
                 password_input.send_keys(self._password)
+                # wait until the field holds the whole password
+                WebDriverWait(self.driver, 2).until(
+                    lambda driver: len(
+                        password_input.get_attribute('value') or ''
+                    )
+                    == len(self._password)
+                )
+                break
+            except StaleElementReferenceException:
+                # field was re-rendered. Look it up again and retry.
+                password_input = self._find(
+                    *self._login_locators['password_input']
+                )
+            except TimeoutException:
+                continue  # password was not entered. Try again.
         # submit
         log.debug('Submiting credentials')
-        submit_button = self.driver.find_element_by_id(
-            login_form_ids['submit_button']
-        )
+        submit_button = self._find(*self._login_locators['submit_button'])
         submit_button.click()
-        time.sleep(2)
+        # wait for the homepage greetings to show up
+        self._find(By.ID, self._greeting_statement_id)
 
     def greet(self) -> str:
         """Say Hello to user (for checking the connection)"""
-        greetings = self.driver.find_element_by_id(
-            self._greeting_statement_id
-        ).text
-        return greetings
+        # the greeting does not change during the session; read it only once
+        if self._greeting is None:
+            self._greeting = self._js_get(
+                self._greeting_statement_id, 'innerText'
+            )
+        return self._greeting
 
     def reset(self):
         """Force driver to go back to initial page."""
@@ -195,18 +626,28 @@ class SiafeClient:
         """Close the current connection."""
         self.driver.close()
 
+    def quit(self) -> None:
+        """Close the browser and stop its ChromeDriver process."""
+        self.driver.quit()
+
     @property
     def available_ugs(self) -> Sequence[Mapping[str, str]]:
         """Get available Managemet Units (UGs)."""
+        if self._available_ugs is not None:
+            # options do not change during the session; reuse them
+            return self._available_ugs
         log.info('Checking available budget Management Units...')
-        ug_select = Select(self.driver.find_element_by_id(self._ug_select_id))
-        ug_options = ug_select.options
+        ug_options_texts = self._ug_options_texts
+        if ug_options_texts is None:
+            ug_options_texts = self._ug_snapshot()['options']
+            self._ug_options_texts = ug_options_texts
         # UG visible text has the format '999999 - NAME OF THE UNIT'; split it
         ugs_splitted = [
-            re.split(' +- +', ug_option.text, 1) for ug_option in ug_options
+            _split_ug_text(ug_option_text)
+            for ug_option_text in ug_options_texts
         ]
         # create a dict with UG name and id for each one
-        available_ugs = list()
+        available_ugs: List[Mapping[str, str]] = list()
         for ug_splitted in ugs_splitted:
             if ug_splitted[0] == 'TODAS':
                 # 'ALL' budget management units option
@@ -217,24 +658,58 @@ class SiafeClient:
                 )
         # make available units accessible instance-wide
         self._available_ugs = available_ugs
-        return self._available_ugs
+        return available_ugs
 
     @property
     def ug(self) -> Mapping[str, str]:
         """Get current budget Management Unit (UG)."""
         log.info('Checking current Management Unit...')
         # current unit appears in the "title" attribute of the <select> element
-        ug_select = self.driver.find_element_by_id(self._ug_select_id)
-        ug_select_title = ug_select.get_attribute('title')
+        ug_snapshot = self._ug_snapshot()
+        ug_select_title = ug_snapshot['title']
+        if self._ug_options_texts is None:
+            # keep the options for later searches
+            self._ug_options_texts = ug_snapshot['options']
+        self._ug = self._parse_ug_title(ug_select_title)
+        return self._ug
+
+    @staticmethod
+    def _parse_ug_title(ug_select_title: str) -> Mapping[str, str]:
+        """Get the code and name of the UG in the <select> element title."""
         if ug_select_title == 'TODAS':
             # 'ALL' budget management units option is selected (default)
-            self._ug = {'id': '000000', 'name': 'TODAS'}
-            return self._ug
+            return {'id': '000000', 'name': 'TODAS'}
         # A specific UG has been selected.
         # UG statement has the format '999999 - NAME OF THE UNIT'; split it
-        ug_splitted = re.split(r' +- +', ug_select_title, 1)
-        self._ug = {'id': ug_splitted[0], 'name': ug_splitted[1]}
-        return self._ug
+        ug_splitted = _split_ug_text(ug_select_title)
+        return {'id': ug_splitted[0], 'name': ug_splitted[1]}
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """Read the state shown in the homepage.
+
+        Waits until the greeting and the fiscal year statement are displayed,
+        and reads them along with the current UG.
+
+        Returns:
+            A mapping with the `greeting` to the user, the fiscal `year`
+            statement and the current budget Management Unit (`ug`, as in
+            `SiafeClient.ug`, or `None` if it is not in the page).
+        """
+
+        def read_state(driver: webdriver.Remote) -> Any:
+            state = driver.execute_script(
+                self._snapshot_js,
+                self._greeting_statement_id,
+                self._year_statement_id,
+                self._ug_select_id,
+            )
+            # keep waiting while the statements are not rendered yet
+            return state if state['greeting'] and state['year'] else False
+
+        state = self._wait.until(read_state)
+        if state['ug'] is not None:
+            state['ug'] = self._parse_ug_title(state['ug'])
+        return state
 
     def set_ug(self, ug_code: str = r'[0-9]{6}', ug_name: str = r'.*') -> None:
         """Set the desired Management Unit (UG).
@@ -259,21 +734,40 @@ class SiafeClient:
             the desired panel has been selected.
         """
         log.info('Changing budget Management Unit (UG)...')
-        # find select menu in page
-        ug_select = Select(self.driver.find_element_by_id(self._ug_select_id))
         # set 'ALL' management units option
         if ug_code == '000000' or ug_name.upper() == 'TODAS':
             log.debug('Selected ALL Management Units.')
-            ug_select.select_by_visible_text('TODAS')
+            self._select_ug_option('TODAS')
             self._ug = {'000000': 'TODAS'}
             log.info('Successfully set current view to all Management Units.')
             return
         # search option text that matches the given code and/or name
         log.debug('Searching Management Units that match the given pattern...')
-        regexpr = re.compile(ug_code + r' +- +' + ug_name)
-        ug_options = ug_select.options
-        ug_options_texts = [ug_option.text for ug_option in ug_options]
-        target_options_texts = list(filter(regexpr.match, ug_options_texts))
+        regexpr = _ug_pattern(ug_code, ug_name)
+        ug_options_texts = self._ug_options_texts
+        from_cache = ug_options_texts is not None
+        if ug_options_texts is None:
+            ug_options_texts = self._ug_snapshot()['options']
+            self._ug_options_texts = ug_options_texts
+        if ug_code.isdigit():
+            # a literal code; look it up instead of searching all options
+            if self._ug_by_code is None:
+                self._ug_by_code = {
+                    _split_ug_text(ug_option_text)[0]: ug_option_text
+                    for ug_option_text in ug_options_texts
+                }
+            ug_option_text = self._ug_by_code.get(ug_code)
+            target_options_texts = (
+                [ug_option_text]
+                if ug_option_text is not None and regexpr.match(ug_option_text)
+                else []
+            )
+        else:
+            target_options_texts = [
+                ug_option_text
+                for ug_option_text in ug_options_texts
+                if regexpr.match(ug_option_text)
+            ]
         # manage when number of matches != 1
         if len(target_options_texts) == 0:
             log.error(
@@ -290,10 +784,18 @@ class SiafeClient:
         else:
             # found one match. Now change in webdriver
             log.debug('Found exactly one match. Selecting...')
-            ug_select.select_by_visible_text(target_options_texts[0])
+            try:
+                self._select_ug_option(target_options_texts[0])
+            except NoSuchElementException:
+                if not from_cache:
+                    raise
+                # cached options are outdated; read them again and retry
+                log.debug('Management Units changed. Searching again...')
+                self._forget_ugs()
+                return self.set_ug(ug_code, ug_name)
             # update instance's UG attribute
             log.debug("Option selected. Updating client's attributes...")
-            ug_splitted = re.split(r' +- +', target_options_texts[0], 1)
+            ug_splitted = _split_ug_text(target_options_texts[0])
             self._ug = {'id': ug_splitted[0], 'name': ug_splitted[1]}
             log.info(
                 'Successfully set current view to Management Unit '
@@ -308,21 +810,18 @@ class SiafeClient:
         """Read only property with the SIAFE-Rio system version."""
         # TODO: get SIAFE-Rio system version in page footer.
         raise NotImplementedError
-        return self.version
 
     @property
     def build(self) -> int:
         """Read only property with the SIAFE-Rio system build."""
         # TODO: get SIAFE-Rio system version in page footer.
         raise NotImplementedError
-        return self.build
 
     @property
     def remaining_time(self) -> timedelta:
         """Read only property with the session's remaining time."""
         # TODO: get session's remaining time in page footer.
         raise NotImplementedError
-        return self.remaining_time
 
 
 class ExecutionPanel(SiafeClient):
@@ -335,6 +834,8 @@ class ExecutionPanel(SiafeClient):
     attributed to the Budgetary Units by the Public Budget.
     """
 
+    __slots__ = ('_description',)
+
     _tab_id = 'pt1:pt_np4:1:pt_cni6::disclosureAnchor'
     _subpanel_ids = {
         'budgetary': 'pt1:pt_np3:0:pt_cni4::disclosureAnchor',
@@ -342,33 +843,85 @@ class ExecutionPanel(SiafeClient):
         'accountancy': 'pt1:pt_np3:2:pt_cni4::disclosureAnchor',
         'contracts and covenants': 'pt1:pt_np3:3:pt_cni4::disclosureAnchor',
     }
+    _description_id = 'pt1:pt_pgl4::c'
+    _description_xpath = f"//div[@id='{_description_id}']/span"
+    _description_js = """
+        const container = document.getElementById(arguments[0]);
+        const span = container && container.querySelector(':scope > span');
+        return span ? span.innerText : null;
+    """
+    _displayed_js = """
+        const element = document.getElementById(arguments[0]);
+        return Boolean(element && element.getClientRects().length > 0);
+    """
+    _location: Tuple[str, ...] = ('execution',)
 
     def __init__(self, client: SiafeClient):
-        self.driver = client.driver
-        tab = self.driver.find_element_by_id(self._tab_id)
-        for attempt in range(1, 4):
-            tab.click()  # access budget execution tab
-            try:
-                self.description  # check that panel description appeared
-                break
-            except StaleElementReferenceException:
-                if attempt < 3:
-                    log.debug(
-                        'Could not access budget execution. '
-                        + f'Try again... (attempt {attempt}/3)'
-                    )
-                    continue  # did not appear. Try again.
-                else:
-                    log.error('Could not access budget execution.')
-                    raise
+        self._share_session(client)
+        if self._reached(
+            ExecutionPanel._location, self._subpanel_ids['budgetary']
+        ):
+            return  # execution tab is already open
+        tab = self._wait.until(
+            EC.element_to_be_clickable((By.ID, self._tab_id))
+        )
+        tab.click()  # access budget execution tab
+        try:
+            # check that panel description appeared
+            self._description = self._wait.until(
+                EC.visibility_of_element_located(
+                    (By.XPATH, self._description_xpath)
+                )
+            ).text
+        except TimeoutException:
+            log.error('Could not access budget execution.')
+            raise
+        self._navigation['location'] = ExecutionPanel._location
+
+    def _share_session(self, client: SiafeClient) -> None:
+        """Browse with the same WebDriver session as another client."""
+        self._setup_session(
+            client.driver,
+            client.timeout,
+            user=client.user,
+            fiscal_year=client.fiscal_year,
+            # keep track of where the shared session is
+            navigation=client._navigation,
+            wait=client._wait,
+        )
+        self._description = None
+
+    def _reached(self, location: Tuple[str, ...], marker_id: str) -> bool:
+        """Checks whether a navigation step can be skipped.
+
+        The step can be skipped if the session has already gone through it,
+        and has not left the way to the location of this instance since. As
+        SIAFE-Rio may reload pages by itself (e.g., while scrolling tables),
+        an element shown only after the step (`marker_id`) must also still be
+        displayed.
+        """
+        current_location = self._navigation.get('location', ())
+        if not (
+            current_location[: len(location)] == location
+            and self._location[: len(current_location)] == current_location
+        ):
+            return False
+        if self.driver.execute_script(self._displayed_js, marker_id):
+            return True
+        # the page has changed since the last navigation; forget it
+        self._navigation.pop('location', None)
+        return False
 
     @property
     def description(self):
         """Panel description"""
-        description = self.driver.find_element_by_xpath(
-            r"//div[@id='pt1:pt_pgl4::c']/span"
-        ).text
-        return description
+        # the description does not change while the panel is open; read it
+        # only once
+        if self._description is None:
+            self._description = self.driver.execute_script(
+                self._description_js, self._description_id
+            )
+        return self._description
 
 
 class BudgetExecutionSubpanel(ExecutionPanel):
@@ -378,6 +931,8 @@ class BudgetExecutionSubpanel(ExecutionPanel):
     the Anual Budget Bill (LOA).
     """
 
+    __slots__ = ()
+
     _table_ids = {
         'allocation_details': 'pt1:pt_np2:0:pt_cni3',
         'quota_releasing': 'pt1:pt_np2:1:pt_cni3',
@@ -389,13 +944,30 @@ class BudgetExecutionSubpanel(ExecutionPanel):
         'reservation_note': 'pt1:pt_np2:7:pt_cni3',
         'predicted_revenue': 'pt1:pt_np2:8:pt_cni3',
     }
+    _location: Tuple[str, ...] = ('execution', 'budgetary')
 
     def __init__(self, client: SiafeClient):
         ExecutionPanel.__init__(self, client)
-        subpanel_tab = self.driver.find_element_by_id(
-            self._subpanel_ids['budgetary']
+        if self._reached(
+            BudgetExecutionSubpanel._location,
+            self._table_ids['allocation_details'],
+        ):
+            return  # budgetary subpanel is already open
+        subpanel_tab = self._wait.until(
+            EC.element_to_be_clickable(
+                (By.ID, self._subpanel_ids['budgetary'])
+            )
         )
         subpanel_tab.click()
+        # wait for the subpanel contents to be disclosed
+        self._wait.until(
+            EC.visibility_of_element_located(
+                (By.ID, self._table_ids['allocation_details'])
+            )
+        )
+        # the subpanel shows its own description; read it when asked for
+        self._description = None
+        self._navigation['location'] = BudgetExecutionSubpanel._location
 
 
 class CommitmentNotesTable(BudgetExecutionSubpanel):
@@ -415,6 +987,14 @@ class CommitmentNotesTable(BudgetExecutionSubpanel):
     _headers_class = 'x19p'
     """Class for table headers, containing the legible names of the fields."""
 
+    _headers_js = """
+        return Array.from(
+            document.getElementsByClassName(arguments[0]),
+            (header) => header.innerText.trim()
+        );
+    """
+    """JavaScript that reads the text of all table headers."""
+
     _limit_checkbox_id = 'pt1:tblDocumento:chkRemoveLimit::content'
     """Element ID for the checkbox that enables or disables the limit in the
         number of observations shown in the table.
@@ -430,20 +1010,77 @@ class CommitmentNotesTable(BudgetExecutionSubpanel):
     """Element ID for the scrollable div where registries are shown.
     """
 
+    _loaded_rows_js = """
+        const [tableClass, rowsClass] = arguments;
+        const table = document.getElementsByClassName(tableClass)[0];
+        const rows = table ? table.getElementsByClassName(rowsClass) : [];
+        const last = rows[rows.length - 1];
+        return [rows.length, last ? last.textContent : null];
+    """
+    """JavaScript that reads the number of rows loaded in the table and the
+        content of the last one, to tell when new records have been loaded.
+    """
+
+    _scrape_rows_js = """
+        const [tableClass, rowsClass, cellsSelector] = arguments;
+        const table = document.getElementsByClassName(tableClass)[0];
+        if (!table) {
+            return [];
+        }
+        return Array.from(
+            table.getElementsByClassName(rowsClass),
+            (row) => Array.from(
+                row.querySelectorAll(cellsSelector),
+                (cell) => cell.innerText.trim()
+            )
+        );
+    """
+    """JavaScript that reads the text of the cells in every loaded row of the
+        table, as a list of lists.
+    """
+
+    _switch_limit_js = """
+        const [checkboxId, limit] = arguments;
+        const checkbox = document.getElementById(checkboxId);
+        // the checkbox removes the limit when checked
+        if (checkbox.checked === limit) {
+            checkbox.click();
+        }
+        return !checkbox.checked;
+    """
+    """JavaScript that sets the limit checkbox to the desired state, and
+        returns whether the limit is in place.
+    """
+
+    _location: Tuple[str, ...] = ('execution', 'budgetary', 'commitment_note')
+    """Navigation steps from the homepage to the table."""
+
     def __init__(self, client=SiafeClient):
         BudgetExecutionSubpanel.__init__(self, client)
-        table_link = self.driver.find_element_by_id(
-            self._table_ids['commitment_note']
+        if self._reached(
+            CommitmentNotesTable._location, self._limit_checkbox_id
+        ):
+            return  # table is already open
+        table_link = self._wait.until(
+            EC.element_to_be_clickable(
+                (By.ID, self._table_ids['commitment_note'])
+            )
         )
         table_link.click()
+        # wait for the table to be loaded
+        self._find(By.ID, self._limit_checkbox_id)
         self.limit = False
+        self._navigation['location'] = CommitmentNotesTable._location
+
+    def _switch_limit(self, limit: bool) -> bool:
+        """Place/remove the limit on the number of displayed notes.
 
-    def _switch_limit(self) -> None:
-        """Place/remove the limit on the number of displayed notes."""
-        limit_checkbox = self.driver.find_element_by_id(
-            self._limit_checkbox_id
+        Clicks the limit checkbox only if needed, and returns whether the
+        limit is in place afterwards.
+        """
+        return self.driver.execute_script(
+            self._switch_limit_js, self._limit_checkbox_id, limit
         )
-        limit_checkbox.click()
 
     @property
     def description(self):
@@ -454,11 +1091,10 @@ class CommitmentNotesTable(BudgetExecutionSubpanel):
     @property
     def limit(self) -> bool:
         """Get the current state of the number of notes displayed (limited or not)."""
-        limit_checkbox = self.driver.find_element_by_id(
-            self._limit_checkbox_id
+        limit_checkbox_status = self._js_get(
+            self._limit_checkbox_id, 'checked'
         )
-        limit_checkbox_status = limit_checkbox.get_attribute('checked')
-        if limit_checkbox_status is None:
+        if not limit_checkbox_status:
             self._limit = True
             return self._limit
         else:
@@ -468,77 +1104,199 @@ class CommitmentNotesTable(BudgetExecutionSubpanel):
     @limit.setter
     def limit(self, value: bool) -> None:
         """Choose whether to show all notes (False) or only the first 1000 (True)."""
-        if self.limit != value:
-            self._switch_limit()
-            self._limit = value
+        self._limit = self._switch_limit(value)
 
-    @property
+    @cached_property
     def filter_menu(self):
-        return FilterMenu(self)
+        return FilterMenu(self, timeout=self.timeout)
 
     @cached_property
     def properties(self) -> Sequence[str]:
         """Get note properties."""
-        table_headers = self.driver.find_elements_by_class_name(
-            self._headers_class
+        # wait until headers are rendered, and read them all at once
+        properties = self._wait.until(
+            lambda driver: driver.execute_script(
+                self._headers_js, self._headers_class
+            )
         )
-        properties = [column_header.text for column_header in table_headers]
         self._properties = properties
         return self._properties
 
     def _scroll(self) -> None:
         """Scroll records table, so that more records are loaded"""
-        loaded_table = self.driver.find_element_by_class_name(
-            self._loaded_table_class
+        loaded_table = self.driver.find_element(
+            By.CLASS_NAME, self._loaded_table_class
         )
         scroll_by = loaded_table.size["height"]
+        loaded_rows = self.driver.execute_script(
+            self._loaded_rows_js, self._loaded_table_class, self._rows_class
+        )
         self.driver.execute_script(
             f"document.getElementById('{self._scroller_id}').scrollBy({{"
             + f"top: {scroll_by}, left: 0, behavior: 'smooth'}});"
         )
-        time.sleep(5)
+        # wait until the loaded rows change
+        try:
+            self._wait.until(
+                lambda driver: driver.execute_script(
+                    self._loaded_rows_js,
+                    self._loaded_table_class,
+                    self._rows_class,
+                )
+                != loaded_rows
+            )
+        except TimeoutException:
+            log.debug('No more records were loaded after scrolling.')
 
-    @cached_property
-    def records(self):
-        """List all records for table."""
+    def iter_records(self) -> Iterator[Mapping[str, str]]:
+        """Iterate over all records for table, as they are loaded.
+
+        Records are yielded as soon as they are read from the screen, before
+        scrolling for the next ones, so that they do not need to be held in
+        memory all at once.
+        """
 
         # remove records limit
         self.limit = False
 
-        records = list()
+        seen_rows: Set[Tuple[str, ...]] = set()
+        # wait for the table to be loaded
+        self._find(By.CLASS_NAME, self._loaded_table_class)
+        properties = self.properties
         while True:
             # save number of records before adding the ones in the screen
-            records_num = len(records)
+            records_num = len(seen_rows)
 
             # read records in the current screen
-            loaded_table = self.driver.find_element_by_class_name(
-                self._loaded_table_class
+            rows_values = self.driver.execute_script(
+                self._scrape_rows_js,
+                self._loaded_table_class,
+                self._rows_class,
+                self._cells_selector,
             )
-            row_elements = loaded_table.find_elements_by_class_name(
-                self._rows_class
-            )
-            for row_element in row_elements:
-                record = dict()
-                cell_elements = row_element.find_elements_by_css_selector(
-                    self._cells_selector
-                )
-                cell_values = [
-                    cell_element.text for cell_element in cell_elements
-                ]
-                # save to `records` variable
-                for index, value in enumerate(cell_values):
-                    property_ = self.properties[index]
-                    record[property_] = value
-                if record not in records:
-                    records.append(record)
-                    print(record)
+            for cell_values in rows_values:
+                # skip rows that were already read before scrolling
+                row_key = tuple(cell_values)
+                if row_key in seen_rows:
+                    continue
+                seen_rows.add(row_key)
+                yield dict(zip(properties, cell_values))
 
             # check if anything new was added
-            if len(records) == records_num:  # break if not
+            if len(seen_rows) == records_num:  # break if not
                 break
             else:  # keep scrolling if so
                 self._scroll()
                 # BUG: Siafe reloads "Budgetary Execution" page instead of
                 # fetching new records.
 
-        return records
+    @cached_property
+    def records(self):
+        """List all records for table."""
+        return list(self.iter_records())
+
+
+_worker_client_kwargs: Mapping[str, Any] = {}
+"""Arguments for the `SiafeClient` of the current `SiafeClientPool` worker."""
+
+_worker_client: Optional[SiafeClient] = None
+"""`SiafeClient` owned by the current `SiafeClientPool` worker process."""
+
+
+def _init_pool_worker(
+    client_kwargs: Mapping[str, Any],
+    stagger: float,
+    started_workers: Any,
+) -> None:
+    """Prepare a `SiafeClientPool` worker process.
+
+    Delays each worker by `stagger` seconds times its position, so that
+    workers do not sign in SIAFE-Rio all at the same time.
+    """
+    global _worker_client_kwargs
+    _worker_client_kwargs = client_kwargs
+    with started_workers.get_lock():
+        worker_index = started_workers.value
+        started_workers.value += 1
+    time.sleep(stagger * worker_index)
+
+
+def _run_in_pool_worker(
+    fn: Callable[[SiafeClient, str], Any], ug_code: str
+) -> Any:
+    """Call a function with the worker's own client, creating it if needed."""
+    global _worker_client
+    if _worker_client is None:
+        _worker_client = SiafeClient(**_worker_client_kwargs)
+        # quit the browser when the worker process exits
+        Finalize(None, _worker_client.quit, exitpriority=10)
+    return fn(_worker_client, ug_code)
+
+
+class SiafeClientPool:
+    """Pool of processes, each one signed in SIAFE-Rio with its own client.
+
+    WebDriver sessions cannot be shared between threads, so each worker
+    process owns a `SiafeClient`, created when it gets its first task and
+    reused for the next ones. Tasks for different Management Units (UGs) then
+    run in parallel.
+
+    Keyword Arguments:
+        max_workers: Maximum number of worker processes (and, thus, of
+            simultaneous sessions). Defaults to the number of processors.
+        stagger: Delay between the start of consecutive workers (in seconds),
+            to avoid signing in with all of them at once. Defaults to 0.1
+            seconds.
+        **client_kwargs: Arguments for creating each worker's `SiafeClient`
+            (such as `user`, `password` and `driver_path`).
+
+    Example:
+        >>> def count_notes(client, ug_code):
+        ...     table = CommitmentNotesTable(client)
+        ...     table.set_ug(ug_code)
+        ...     return len(table.records)
+        >>> pool = SiafeClientPool(user=..., password=..., driver_path=...)
+        >>> with pool:
+        ...     notes_count = list(pool.map_ugs(count_notes, ['240400']))
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        stagger: float = 0.1,
+        **client_kwargs: Any,
+    ):
+        started_workers = multiprocessing.Value('i', 0)
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_pool_worker,
+            initargs=(client_kwargs, stagger, started_workers),
+        )
+
+    def map_ugs(
+        self,
+        fn: Callable[[SiafeClient, str], Any],
+        ug_codes: Iterable[str],
+    ) -> Iterator[Any]:
+        """Call a function for each Management Unit (UG), in parallel.
+
+        Arguments:
+            fn: Function to be called with a worker's `SiafeClient` and an UG
+                code. It must be picklable (e.g., defined at module level).
+            ug_codes: Codes of the budget Management Units (UGs).
+
+        Returns:
+            An iterator over the results of `fn`, in the same order as
+            `ug_codes`.
+        """
+        return self._executor.map(_run_in_pool_worker, repeat(fn), ug_codes)
+
+    def close(self) -> None:
+        """Wait for pending tasks and close all worker sessions."""
+        self._executor.shutdown()
+
+    def __enter__(self) -> 'SiafeClientPool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
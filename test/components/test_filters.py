@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+from selenium.common.exceptions import StaleElementReferenceException
+
+from bussola_etl_siafe.components.filters import Filter, FilterMenu
+
+
+def test_filter_equality() -> None:
+    """Tests comparing filters with each other and with other objects."""
+    filter_ = Filter(filtered_property="Fonte", operation="igual", value="104")
+    assert filter_ == Filter("Fonte", "igual", "104")
+    assert filter_ != Filter("Fonte", "igual", "104", negate=True)
+    assert filter_ != Filter("Fonte", "diferente", "104")
+    assert filter_ != "Fonte igual 104"
+
+
+def test_filter_from_fields() -> None:
+    """Tests creating filters from the fields read in a filter row."""
+    filter_ = Filter.from_fields(
+        {
+            'filtered_property': "Fonte",
+            'operation': "igual",
+            'value': "104",
+            'negate': True,
+        }
+    )
+    assert filter_ == Filter("Fonte", "igual", "104", negate=True)
+    # the row reserved for adding a new filter is skipped
+    empty_row = {
+        'filtered_property': "Selecione",
+        'operation': None,
+        'value': None,
+        'negate': False,
+    }
+    assert Filter.from_fields(empty_row) is None
+
+
+class _Element:
+    """Stub for a `WebElement`, that goes stale after `stale_after` clicks."""
+
+    def __init__(self, stale_after=None):
+        self.stale_after = stale_after
+        self.clicks = 0
+
+    def click(self):
+        if self.stale_after is not None and self.clicks >= self.stale_after:
+            raise StaleElementReferenceException()
+        self.clicks += 1
+
+    def find_elements(self, by, value):
+        return []
+
+
+class _Driver:
+    """Stub for a WebDriver, that returns the given elements in order."""
+
+    def __init__(self, *elements):
+        self.elements = list(elements)
+
+    def find_element(self, by, value):
+        return self.elements.pop(0)
+
+
+def test_filter_menu_stale_body() -> None:
+    """Tests that a stale cached menu body is looked up again."""
+    stale_body, body, header = _Element(stale_after=0), _Element(), _Element()
+    page = SimpleNamespace(driver=_Driver(stale_body, body, header))
+    menu = FilterMenu(page, timeout=1)  # type: ignore
+    menu._body  # cache the element that is about to go stale
+    menu.apply()
+    assert body.clicks == 1
+    assert not menu.visible
@@ -0,0 +1,20 @@
+import os
+
+import log
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--reuse-browser",
+        action="store_true",
+        default=False,
+        help=(
+            "attach to a Chrome browser already listening on the remote "
+            "debugging port, instead of launching a new one"
+        ),
+    )
+
+
+def pytest_configure(config):
+    # keep full verbosity only when not running as a pytest-xdist worker
+    log.init(verbosity=1 if os.getenv('PYTEST_XDIST_WORKER') else 3)
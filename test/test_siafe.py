@@ -0,0 +1,261 @@
+import multiprocessing
+from multiprocessing.util import Finalize
+from types import SimpleNamespace
+from typing import List, Tuple
+
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from bussola_etl_siafe import siafe
+from bussola_etl_siafe.siafe import (
+    BudgetExecutionSubpanel,
+    CommitmentNotesTable,
+    ExecutionPanel,
+    SiafeClient,
+    _split_ug_text,
+    _ug_pattern,
+)
+
+UG_OPTIONS_TEXTS: List[str] = [
+    'TODAS',
+    '240400 - FECAM',
+    '240401 - FECAM II',
+    '100100 - SECRETARIA',
+]
+
+
+@pytest.fixture
+def offline_client(monkeypatch) -> Tuple[SiafeClient, List[str]]:
+    """Creates a client with known UG options, that does not use a browser.
+
+    Returns the client and a list with the texts of the options selected.
+    """
+    selected: List[str] = []
+    monkeypatch.setattr(
+        siafe,
+        'select_by_visible_text',
+        lambda select_elem, text: selected.append(text),
+    )
+    monkeypatch.setattr(
+        SiafeClient, '_ug_select', lambda self, refresh=False: None
+    )
+    client = SiafeClient.__new__(SiafeClient)
+    client._forget_ugs()
+    client._ug_options_texts = list(UG_OPTIONS_TEXTS)
+    return client, selected
+
+
+def test_split_ug_text() -> None:
+    """Tests splitting UG texts into their code and name."""
+    assert _split_ug_text('240400 - FECAM') == ['240400', 'FECAM']
+    assert _split_ug_text('240400  -  FECAM') == ['240400', 'FECAM']
+    # only the separator after the code is split
+    assert _split_ug_text('240400 - FECAM - RJ') == ['240400', 'FECAM - RJ']
+    assert _split_ug_text('TODAS') == ['TODAS']
+
+
+def test_ug_pattern() -> None:
+    """Tests compiling the expressions for searching UGs."""
+    regexpr = _ug_pattern(r'[0-9]{6}', 'FECAM')
+    assert regexpr.match('240400 - FECAM')
+    assert regexpr.match('240401  -  FECAM II')
+    assert not regexpr.match('100100 - SECRETARIA')
+    # expressions are compiled only once for the same arguments
+    assert _ug_pattern(r'[0-9]{6}', 'FECAM') is regexpr
+
+
+@pytest.mark.parametrize(
+    'ug_code,ug_name,expected_text',
+    [
+        ('240400', r'.*', '240400 - FECAM'),
+        (r'[0-9]{6}', 'FECAM II', '240401 - FECAM II'),
+        (r'1[0-9]{5}', r'[\s\S]*', '100100 - SECRETARIA'),
+    ],
+)
+def test_set_ug(offline_client, ug_code, ug_name, expected_text) -> None:
+    """Tests selecting the single UG that matches the given criteria."""
+    client, selected = offline_client
+    client.set_ug(ug_code, ug_name)
+    assert selected == [expected_text]
+    code, name = _split_ug_text(expected_text)
+    assert client._ug == {'id': code, 'name': name}
+
+
+@pytest.mark.parametrize(
+    'ug_code,ug_name',
+    [
+        # expressions that match newlines must not span several options
+        (r'[0-9]{6}', r'FECAM[\s\S]*'),
+        (r'[0-9]{6}', 'INEXISTENTE'),
+        ('999999', r'.*'),
+    ],
+)
+def test_set_ug_not_single(offline_client, ug_code, ug_name) -> None:
+    """Tests that no UG is selected when zero or multiple options match."""
+    client, selected = offline_client
+    with pytest.raises(ValueError):
+        client.set_ug(ug_code, ug_name)
+    assert selected == []
+
+
+def test_set_ug_stale_select(offline_client, monkeypatch) -> None:
+    """Tests that the UG <select> is looked up again if it has gone stale."""
+    client, selected = offline_client
+    lookups: List[bool] = []
+
+    def select_by_visible_text(select_elem, text):
+        if len(lookups) == 1:
+            raise StaleElementReferenceException()
+        selected.append(text)
+
+    monkeypatch.setattr(
+        siafe, 'select_by_visible_text', select_by_visible_text
+    )
+    monkeypatch.setattr(
+        SiafeClient,
+        '_ug_select',
+        lambda self, refresh=False: lookups.append(refresh),
+    )
+    client.set_ug('240400')
+    assert lookups == [False, True]
+    assert selected == ['240400 - FECAM']
+
+
+def _stub_driver(**methods) -> SimpleNamespace:
+    """Creates a stub for a WebDriver session, with the given methods."""
+    return SimpleNamespace(
+        command_executor=SimpleNamespace(_url='http://127.0.0.1:9515'),
+        session_id='0123456789abcdef',
+        **methods,
+    )
+
+
+def test_release_shared_session() -> None:
+    """Tests that releasing an attached client leaves the session open."""
+    driver = _stub_driver(close=pytest.fail, quit=pytest.fail)
+    client = SiafeClient.__new__(SiafeClient)
+    client._setup_session(driver, timeout=10)
+    client.release()
+    assert client.session_id == '0123456789abcdef'
+    assert client.executor_url == 'http://127.0.0.1:9515'
+    with pytest.raises(RuntimeError):
+        client.driver.get('about:blank')
+
+
+@pytest.mark.parametrize('pooled', [0, siafe._DRIVER_POOL_SIZE])
+def test_release_pooled_session(monkeypatch, pooled) -> None:
+    """Tests giving sessions back to the pool, or quitting if it is full."""
+    quit_calls: List[bool] = []
+    driver = _stub_driver(quit=lambda: quit_calls.append(True))
+    pool_key = ('user', 2020, 'chromedriver', None)
+    idle_drivers = [object()] * pooled
+    monkeypatch.setattr(siafe, '_DRIVER_POOL', {pool_key: list(idle_drivers)})
+    client = SiafeClient.__new__(SiafeClient)
+    client._setup_session(driver, timeout=10, pool_key=pool_key)
+    client.release()
+    if pooled < siafe._DRIVER_POOL_SIZE:
+        assert siafe._DRIVER_POOL[pool_key] == idle_drivers + [driver]
+        assert quit_calls == []
+    else:
+        assert siafe._DRIVER_POOL[pool_key] == idle_drivers
+        assert quit_calls == [True]
+    # the released client cannot use the session anymore
+    with pytest.raises(RuntimeError):
+        client.driver.get('about:blank')
+
+
+class _WorkerClient:
+    """Stub for the `SiafeClient` of a pool worker."""
+
+    __slots__ = ('kwargs', 'quit_called')
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_run_in_pool_worker(monkeypatch) -> None:
+    """Tests that a pool worker creates its client once and quits it."""
+    finalizers = []
+    monkeypatch.setattr(siafe, 'SiafeClient', _WorkerClient)
+    monkeypatch.setattr(siafe, '_worker_client', None)
+    monkeypatch.setattr(
+        siafe,
+        'Finalize',
+        lambda *args, **kwargs: finalizers.append(Finalize(*args, **kwargs)),
+    )
+    client_kwargs = {'user': 'user', 'password': 'password'}
+    siafe._init_pool_worker(client_kwargs, 0, multiprocessing.Value('i', 0))
+    results = [
+        siafe._run_in_pool_worker(
+            lambda client, ug_code: (client, ug_code), ug
+        )
+        for ug in ['240400', '100100']
+    ]
+    client = results[0][0]
+    assert results == [(client, '240400'), (client, '100100')]
+    assert client.kwargs == client_kwargs
+    # the browser and ChromeDriver are quit when the worker process exits
+    assert len(finalizers) == 1
+    finalizers[0]()
+    assert client.quit_called
+
+
+def test_snapshot_waits_for_statements() -> None:
+    """Tests that the homepage state is read after the statements render."""
+    states = [
+        {'greeting': None, 'year': None, 'ug': None},
+        {'greeting': 'Seja bem-vindo(a), USER', 'year': None, 'ug': None},
+        {
+            'greeting': 'Seja bem-vindo(a), USER',
+            'year': 'Exercício 2020',
+            'ug': 'TODAS',
+        },
+    ]
+    driver = _stub_driver(execute_script=lambda script, *args: states.pop(0))
+    client = SiafeClient.__new__(SiafeClient)
+    client._setup_session(
+        driver, timeout=1, wait=WebDriverWait(driver, 1, poll_frequency=0.01)
+    )
+    assert client.snapshot() == {
+        'greeting': 'Seja bem-vindo(a), USER',
+        'year': 'Exercício 2020',
+        'ug': {'id': '000000', 'name': 'TODAS'},
+    }
+
+
+def test_reached_checks_page() -> None:
+    """Tests skipping navigation steps only when the page still shows them."""
+    displayed_ids = {
+        ExecutionPanel._subpanel_ids['budgetary'],
+        BudgetExecutionSubpanel._table_ids['allocation_details'],
+    }
+    driver = _stub_driver(
+        execute_script=lambda script, element_id: element_id in displayed_ids
+    )
+    table = CommitmentNotesTable.__new__(CommitmentNotesTable)
+    table._setup_session(
+        driver,
+        timeout=10,
+        navigation={'location': CommitmentNotesTable._location},
+    )
+    assert table._reached(
+        ExecutionPanel._location, ExecutionPanel._subpanel_ids['budgetary']
+    )
+    assert table._reached(
+        BudgetExecutionSubpanel._location,
+        BudgetExecutionSubpanel._table_ids['allocation_details'],
+    )
+    # the table has been reloaded away; navigate to it again
+    assert not table._reached(
+        CommitmentNotesTable._location, CommitmentNotesTable._limit_checkbox_id
+    )
+    assert 'location' not in table._navigation
+    # steps that the session has not gone through are not checked in the page
+    assert not table._reached(
+        ExecutionPanel._location, ExecutionPanel._subpanel_ids['budgetary']
+    )
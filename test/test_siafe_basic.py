@@ -1,13 +1,30 @@
+import json
 import os
 from datetime import date
 from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
 
-import log
 import pytest
+from filelock import FileLock
+from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
 
-from bussola_etl_siafe.components.filters import Filter
-from bussola_etl_siafe.siafe import (
+# skip instead of failing collection (once per xdist worker) when the
+# environment is not set up for connecting to SIAFE-Rio
+MISSING_ENV_VARS = [
+    var
+    for var in ('SIAFE_USER', 'SIAFE_PASSWORD', 'CHROME_PATH')
+    if not os.getenv(var)
+]
+if MISSING_ENV_VARS:
+    pytest.skip(
+        f"{', '.join(MISSING_ENV_VARS)} not set", allow_module_level=True
+    )
+
+from bussola_etl_siafe.components.filters import Filter  # noqa: E402
+from bussola_etl_siafe.siafe import (  # noqa: E402
     BudgetExecutionSubpanel,
     CommitmentNotesTable,
     ExecutionPanel,
@@ -19,59 +36,186 @@ USER: str = os.environ['SIAFE_USER']
 PASSWORD: str = os.environ['SIAFE_PASSWORD']
 FECAM_CODE: str = '240400'
 BUDGET_SOURCE: str = "104"
+EXPECTED_YEAR_TEXT: str = f'Exercício {date.today().year}'
+EXPECTED_EXECUTION_DESC: str = (
+    'Este módulo permite a execução orçamentária e financeira.'
+)
+EXPECTED_BUDGET_DESC: str = (
+    'A execução orçamentária é a utilização dos créditos'
+)
 
 DRIVER_PATH = os.getenv('CHROME_PATH', os.path.join(REPO_ROOT, "chromedriver"))
 DRIVER_OPTIONS = Options()
-DRIVER_OPTIONS.add_argument("--remote-debugging-port=9515")
+# tests can run in parallel with pytest-xdist, with one browser per worker
+# (e.g., `pytest -n 2 --dist=loadfile`; more workers tend to make ChromeDriver
+# flaky). Each worker needs its own remote debugging port.
+XDIST_WORKER = os.getenv('PYTEST_XDIST_WORKER', 'gw0')
+DEBUGGING_PORT = 9515 + int(XDIST_WORKER[2:])
+DRIVER_OPTIONS.add_argument(f"--remote-debugging-port={DEBUGGING_PORT}")
 
-DRIVER_OPTIONS.headless = False
+# run without a visible browser, unless HEADLESS=0 (e.g., for debugging)
+if os.getenv('HEADLESS', '1') == '1':
+    DRIVER_OPTIONS.add_argument("--headless=new")
+    DRIVER_OPTIONS.add_argument("--disable-gpu")
+# Chrome's sandbox does not work in most containers and CI runners
+DRIVER_OPTIONS.add_argument("--no-sandbox")
+DRIVER_OPTIONS.add_argument("--disable-dev-shm-usage")
+# do not wait for images and other subresources when loading pages
+DRIVER_OPTIONS.set_capability("pageLoadStrategy", "eager")
+# do not load images nor ask for notifications (stylesheets are still loaded,
+# as visibility checks and table scrolling depend on them)
+DRIVER_OPTIONS.add_experimental_option(
+    "prefs",
+    {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    },
+)
 
-log.init(verbosity=3)
+# third-party resources that tests never need; requests to them are dropped
+BLOCKED_URLS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+]
 
+DISPLAYED_JS = """
+    return arguments[0].map((id) => {
+        const element = document.getElementById(id);
+        return Boolean(
+            element
+            && (element.offsetParent !== null
+                || element.getClientRects().length > 0)
+        );
+    });
+"""
 
-@pytest.fixture(scope='module')
-def siafe():
-    """Creates a reusable connection to Siafe Basic"""
-    # create connection
-    client = SiafeClient(
+SESSION_FILE_NAME = 'siafe_session.json'
+
+COUNT_JS = "return document.querySelectorAll(arguments[0]).length;"
+
+
+def assert_displayed(driver, element_ids) -> None:
+    """Asserts that all elements are displayed."""
+    element_ids = list(element_ids)
+    displayed = driver.execute_script(DISPLAYED_JS, element_ids)
+    assert all(displayed), dict(zip(element_ids, displayed))
+
+
+def connect() -> SiafeClient:
+    """Signs in SIAFE-Rio with a new browser."""
+    return SiafeClient(
         user=USER,
         password=PASSWORD,
         driver_path=DRIVER_PATH,
         driver_options=DRIVER_OPTIONS,
     )
+
+
+def connect_shared(
+    shared_dir: Path,
+) -> Tuple[SiafeClient, Optional[webdriver.Chrome]]:
+    """Connects to SIAFE-Rio, signing in only once for all xdist workers.
+
+    The first worker to get the lock signs in and saves its session cookies;
+    the others load them in their own browsers, instead of signing in again.
+    Returns the client and, for the latter, the browser that must be quit
+    after the tests.
+    """
+    session_file = shared_dir / SESSION_FILE_NAME
+    with FileLock(f'{session_file}.lock'):
+        if not session_file.is_file():
+            client = connect()
+            session = {
+                'url': client.driver.current_url,
+                'cookies': client.driver.get_cookies(),
+            }
+            session_file.write_text(json.dumps(session))
+            return client, None
+        session = json.loads(session_file.read_text())
+    driver = webdriver.Chrome(DRIVER_PATH, options=DRIVER_OPTIONS)
+    SiafeClient._prepare_driver(driver)
+    # cookies can only be added for the domain of the current page, and must
+    # be there before the first request to the signed in page
+    url = urlsplit(session['url'])
+    driver.get(f'{url.scheme}://{url.netloc}/')
+    for cookie in session['cookies']:
+        driver.add_cookie(cookie)
+    driver.get(session['url'])
+    client = SiafeClient.from_session(
+        driver.command_executor._url, driver.session_id
+    )
+    return client, driver
+
+
+@pytest.fixture(scope='session')
+def siafe(request, tmp_path_factory):
+    """Creates a reusable connection to Siafe Basic"""
+    reuse_browser = request.config.getoption('--reuse-browser')
+    owned_driver = None
+    session_file = None
+    # create connection
+    if reuse_browser:
+        # attach to a browser already listening on the debugging port
+        DRIVER_OPTIONS.debugger_address = f"127.0.0.1:{DEBUGGING_PORT}"
+        client = connect()
+    elif 'PYTEST_XDIST_WORKER' in os.environ:
+        # share the login between workers (the temporary directory's parent
+        # is the same for all of them)
+        shared_dir = tmp_path_factory.getbasetemp().parent
+        session_file = shared_dir / SESSION_FILE_NAME
+        client, owned_driver = connect_shared(shared_dir)
+    else:
+        client = connect()
+    # attached clients' drivers cannot send CDP commands; use the owner's
+    chrome_driver = owned_driver or client.driver
+    chrome_driver.execute_cdp_cmd("Network.enable", {})
+    chrome_driver.execute_cdp_cmd(
+        "Network.setBlockedURLs", {"urls": BLOCKED_URLS}
+    )
     try:
         # use connection in tests
         yield client
     finally:
-        # teardown connection after all tests in module finish
-        client.close()
+        # teardown connection after all tests finish
+        if reuse_browser:
+            # leave the browser open for the next run
+            client.driver.get('about:blank')
+        elif owned_driver is not None:
+            owned_driver.quit()
+        else:
+            client.close()
+        # do not leave the session cookies behind for later runs
+        if session_file is not None:
+            session_file.unlink(missing_ok=True)
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def commitment_note_page(siafe):
     page = CommitmentNotesTable(client=siafe)
-    return page
+    yield page
+    # do not leave filters behind
+    page.filter_menu.reset()
 
 
 def test_homepage(siafe) -> None:
     """Tests if it is possible to view SIAFE-Rio homepage after connecting."""
+    # read greeting, fiscal year and current UG at once
+    state = siafe.snapshot()
     # assert that a welcome message is shown
-    greeting = siafe.greet()
-    assert 'Seja bem-vindo(a),' in greeting
+    assert 'Seja bem-vindo(a),' in state['greeting']
     # assert that fiscal year equals to the current year
     # (default behavior when no year is specified)
-    year_statement = siafe.driver.find_element_by_id('pt1:pt_aot2').text
-    assert year_statement == 'Exercício ' + str(date.today().year)
-    assert siafe.ug['name'] == 'TODAS'
-    # TODO: replace with assertions, when properties are implemented
-    # assert that connection throws an exception when unimplemented
-    # properties and methods are accessed
-    with pytest.raises(NotImplementedError):
-        siafe.version
-    with pytest.raises(NotImplementedError):
-        siafe.build
+    assert state['year'] == EXPECTED_YEAR_TEXT
+    assert state['ug']['name'] == 'TODAS'
+
+
+# TODO: replace with assertions, when properties are implemented
+@pytest.mark.parametrize('prop', ['version', 'build', 'remaining_time'])
+def test_unimplemented(siafe, prop) -> None:
+    """Tests that unimplemented properties throw an exception when accessed."""
     with pytest.raises(NotImplementedError):
-        siafe.remaining_time
+        getattr(siafe, prop)
 
 
 def test_execution(siafe) -> None:
@@ -79,10 +223,8 @@ def test_execution(siafe) -> None:
     panel = ExecutionPanel(client=siafe)
     descr = panel.description
     print(descr)
-    assert 'Este módulo permite a execução orçamentária e financeira.' in descr
-    for subpanel_id in panel._subpanel_ids.values():
-        subpanel_tab = panel.driver.find_element_by_id(subpanel_id)
-        assert subpanel_tab.is_displayed()
+    assert EXPECTED_EXECUTION_DESC in descr
+    assert_displayed(panel.driver, panel._subpanel_ids.values())
 
 
 def test_budget_execution(siafe) -> None:
@@ -90,10 +232,8 @@ def test_budget_execution(siafe) -> None:
     subpanel = BudgetExecutionSubpanel(client=siafe)
     descr = subpanel.description
     print(descr)
-    assert 'A execução orçamentária é a utilização dos créditos' in descr
-    for table_id in subpanel._table_ids.values():
-        table_link = subpanel.driver.find_element_by_id(table_id)
-        assert table_link.is_displayed()
+    assert EXPECTED_BUDGET_DESC in descr
+    assert_displayed(subpanel.driver, subpanel._table_ids.values())
 
 
 def test_commitment_table(commitment_note_page) -> None:
@@ -118,11 +258,23 @@ def test_set_filters(commitment_note_page) -> None:
     new_filter = Filter(
         filtered_property="Fonte", operation="igual", value=BUDGET_SOURCE
     )
+    filter_rows_sel = f"[id='{commitment_note_page._filter_menu_id}'] .xzy"
     commitment_note_page.filter_menu.filters = new_filter
+    rows_before = commitment_note_page.driver.execute_script(
+        COUNT_JS, filter_rows_sel
+    )
     commitment_note_page.filter_menu.apply()
-    assert (
-        new_filter in commitment_note_page.filter_menu.filters  # type:ignore
+    # wait for the applied filter to get its own row (the last row is always
+    # reserved for adding a new filter)
+    WebDriverWait(
+        commitment_note_page.driver, commitment_note_page.timeout
+    ).until(
+        lambda driver: driver.execute_script(COUNT_JS, filter_rows_sel)
+        > rows_before
     )
+    filters_after = commitment_note_page.filter_menu.filters
+    # the new filter is added after any existing ones
+    assert filters_after[-1] == new_filter  # type:ignore
     # BUG: for some reason, mypy thinks filter_menu.filters is a Filter, not
     # a list of Filters. May be related to
     # https://github.com/python/mypy/issues/3004